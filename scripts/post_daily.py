@@ -1,18 +1,28 @@
 #!/usr/bin/env python3
 import os
+import re
+import json
+import time
+import tempfile
 import datetime
-from dateutil import tz, parser as dateparser
-import requests  
-from slack_sdk import WebClient
-from slack_sdk.errors import SlackApiError
-from googleapiclient.discovery import build
-from dotenv import load_dotenv
-load_dotenv()
+import functools
+import collections
+import operator
+import concurrent.futures
+import urllib.parse
+# dateutil（日付のあいまい解析）/ requests / slack_sdk / dotenv は起動を軽くするため使う関数の中で import する
+try:
+    # 入っていれば Sheets API のレスポンスやキャッシュの JSON 解析に使う（標準の json より速い）
+    import orjson
+except ImportError:
+    orjson = None
+
+# 日本標準時（夏時間が無いので固定オフセットで十分。tz データベースを読みに行かない）
+JST = datetime.timezone(datetime.timedelta(hours=9), name='JST')
 
 def get_today_jst():
     """Asia/Tokyo の現在日時を返す datetime.datetime (tz-aware)。"""
-    jst = tz.gettz('Asia/Tokyo')
-    return datetime.datetime.now(tz=jst)
+    return datetime.datetime.now(tz=JST)
 
 def get_monday_date(today=None):
     if today is None:
@@ -24,198 +34,428 @@ def get_monday_date(today=None):
 def build_week_dates(monday_date):
     return { monday_date + datetime.timedelta(days=i) for i in range(7) }
 
+# gridData のうち使う項目だけを返してもらう（シート名・セルの表示値・取り消し線）
+GRID_FIELDS = ("sheets(properties(title,index),"
+               "data(rowData(values(formattedValue,effectiveFormat(textFormat(strikethrough)),textFormatRuns))))")
+
+# 正規化したフィールド名 → ヘッダー名の候補（先頭ほど優先）
+FIELD_ALIASES = {
+    'date': ('日付', 'date', 'Date'),
+    'time': ('テスト時間', 'time', 'Time'),
+    'type': ('予定タイプ', 'タイプ', '種別', 'type', 'Type'),
+    'content': ('内容', 'content'),
+    'person': ('担当', 'person'),
+    'absent': ('欠席予定', '欠席者', '欠席', 'absent', 'Absentees'),
+}
+
+def resolve_field_indexes(headers):
+    """
+    ヘッダー行を 1 度だけ走査し、{フィールド名: [列 index, ...]} を返す。
+    列は FIELD_ALIASES の優先順（例: 予定タイプ > タイプ > 種別）に並べ、行ごとに空でない最初の値を使う。
+    同じヘッダーの列が複数ある場合は右側の列を使う（従来の行ごとの辞書化と同じ）。
+    """
+    header_pos = {}
+    for i, h in enumerate(headers):
+        header_pos[h] = i
+    field_idx = {}
+    for field, aliases in FIELD_ALIASES.items():
+        idxs = [header_pos[h] for h in aliases if h in header_pos]
+        if idxs:
+            field_idx[field] = idxs
+    return field_idx
+
+CACHE_DIR = os.path.join(os.path.expanduser('~'), '.cache', 'seminar-reminder')
+DEFAULT_CACHE_TTL_SECONDS = 3600
+# キャッシュに保存するデータの形式を変えたら上げる（古い形式のファイルを読まないようにする）
+CACHE_FORMAT_VERSION = 2
+
+def _get_cache_ttl():
+    """環境変数 CACHE_TTL_SECONDS からキャッシュの有効秒数を返す。0 以下ならキャッシュ無効。"""
+    ttl_env = os.environ.get('CACHE_TTL_SECONDS')
+    if not ttl_env:
+        return DEFAULT_CACHE_TTL_SECONDS
+    try:
+        return int(ttl_env)
+    except ValueError:
+        raise RuntimeError(f"環境変数 CACHE_TTL_SECONDS が整数ではありません: {ttl_env}")
+
+def _json_loads(data):
+    """bytes の JSON を解析する。orjson があればそちらを使う。"""
+    if orjson is not None:
+        return orjson.loads(data)
+    return json.loads(data)
+
+def _cache_path(sheet_id, sheet_key):
+    """sheet_id とシート指定（SHEET_NAME / SHEET_INDEX）からキャッシュファイルのパスを返す。"""
+    name = urllib.parse.quote(f"{sheet_id}-{sheet_key}", safe='')
+    return os.path.join(CACHE_DIR, f"{name}-v{CACHE_FORMAT_VERSION}.json")
+
+def _read_cache(path, ttl):
+    """キャッシュファイルが ttl 秒以内に更新されていれば中身を返す。無い・古い・壊れている場合は None。"""
+    try:
+        if time.time() - os.path.getmtime(path) > ttl:
+            return None
+        with open(path, 'rb') as f:
+            return _json_loads(f.read())
+    except (OSError, ValueError):
+        return None
+
+def _write_cache(path, data):
+    """一時ファイルに書き出してから置き換えることで、途中までしか書かれていないキャッシュを残さない。"""
+    try:
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+        fd, tmp_path = tempfile.mkstemp(dir=os.path.dirname(path), suffix='.tmp')
+        try:
+            with os.fdopen(fd, 'w', encoding='utf-8') as f:
+                json.dump(data, f, ensure_ascii=False)
+            os.replace(tmp_path, path)
+        except BaseException:
+            os.unlink(tmp_path)
+            raise
+    except OSError as e:
+        # キャッシュは高速化のためだけのものなので、書けなくても処理は続行する
+        print(f"キャッシュの書き込みに失敗: {e}")
+
 def load_public_sheet_records():
+    """
+    スプレッドシートの (field_idx, rows) を返す。CACHE_TTL_SECONDS 秒（デフォルト 3600 秒）以内に
+    取得したデータがディスク上にあればそれを使い、無ければ Google Sheets API から取得してキャッシュする。
+    """
+    sheet_id = os.environ.get('SHEET_ID')
+    ttl = _get_cache_ttl()
+    if not sheet_id or ttl <= 0:
+        return _fetch_public_sheet_records()
+
+    sheet_name_env = os.environ.get('SHEET_NAME')
+    if sheet_name_env:
+        sheet_key = f"name={sheet_name_env.strip()}"
+    else:
+        sheet_key = f"index={os.environ.get('SHEET_INDEX') or 0}"
+    sheet_range_env = (os.environ.get('SHEET_RANGE') or '').strip()
+    if sheet_range_env:
+        sheet_key += f"-range={sheet_range_env}"
+    path = _cache_path(sheet_id, sheet_key)
+
+    cached = _read_cache(path, ttl)
+    if cached is not None:
+        field_idx, rows = cached
+        if os.environ.get('DEBUG'):
+            print(f"[DEBUG] Loaded {len(rows)} rows from cache: {path}")
+        return field_idx, rows
+    field_idx, rows = _fetch_public_sheet_records()
+    _write_cache(path, [field_idx, rows])
+    return field_idx, rows
+
+def _is_struck(cell):
+    """
+    取り消し線判定: effectiveFormat.textFormat.strikethrough または
+    textFormatRuns のいずれかの run に strikethrough があるかを確認
+    """
+    eff = cell.get('effectiveFormat', {})
+    txtfmt = eff.get('textFormat', {}) if eff else {}
+    if txtfmt.get('strikethrough'):
+        return True
+    runs = cell.get('textFormatRuns', [])
+    for run in runs:
+        fmt = run.get('format', {}).get('textFormat', {})
+        if fmt.get('strikethrough'):
+            return True
+    return False
+
+# 1 行分のレコード。フィールドは FIELD_ALIASES のキーと同じ順
+SheetRow = collections.namedtuple('SheetRow', FIELD_ALIASES)
+
+def iter_public_sheet_records():
+    """
+    スプレッドシートを読み込み、各行を SheetRow として 1 件ずつ返すイテレータを返す。
+    読み込み（API 呼び出し・キャッシュ参照）はこの関数を呼んだ時点で行うので、失敗はここで例外になる。
+    """
+    field_idx, rows = load_public_sheet_records()
+    return _iter_sheet_rows(field_idx, rows)
+
+def _iter_sheet_rows(field_idx, rows):
+    # 各フィールドについて、候補の列を優先順に見て空でない最初の値を使う
+    field_idxs = [field_idx.get(f, ()) for f in SheetRow._fields]
+    for row in rows:
+        n = len(row)
+        yield SheetRow._make([next((row[i] for i in idxs if i < n and row[i]), '') for idxs in field_idxs])
+
+SHEETS_API_URL = 'https://sheets.googleapis.com/v4/spreadsheets'
+SHEETS_TIMEOUT_SECONDS = 10
+# シート名を含まない A1 範囲は先頭の表示シートを指す（ZZZ はシートの最大列。SHEET_RANGE 未指定時に使う）
+FIRST_SHEET_RANGE = 'A:ZZZ'
+
+def _sheets_get(session, api_key, path, **params):
+    """Sheets API の REST エンドポイントを直接 GET して JSON を返す（discovery ドキュメントの取得・解析を省く）。"""
+    params['key'] = api_key
+    r = session.get(f"{SHEETS_API_URL}/{path}", params=params, timeout=SHEETS_TIMEOUT_SECONDS)
+    if not r.ok:
+        # Google のエラーメッセージ（例: "Unable to parse range: ..."）を残す
+        try:
+            detail = _json_loads(r.content).get('error', {}).get('message')
+        except (ValueError, AttributeError):
+            detail = None
+        raise RuntimeError(f"HTTP {r.status_code}: {detail or r.text}")
+    return _json_loads(r.content)
+
+def _fetch_public_sheet_records():
     """
     環境変数 GOOGLE_API_KEY と SHEET_ID が設定されており、
     該当スプレッドシートが「公開（Anyone with link can view）」になっている前提で、
-    Google Sheets API を API Key で呼び出し、最初のシートの全データを辞書リストとして返す。
+    Google Sheets API を API Key で呼び出し、対象シートのデータを (field_idx, rows) として返す。
+    field_idx は {フィールド名: [列 index, ...]}（優先順）、rows はヘッダーを除いた各行のセル文字列のリスト。
+    日付セルに取り消し線が付いている行は rows に含めない。
     """
     api_key = os.environ.get('GOOGLE_API_KEY')
     sheet_id = os.environ.get('SHEET_ID')
     if not api_key or not sheet_id:
         raise RuntimeError("環境変数 GOOGLE_API_KEY または SHEET_ID が設定されていません")
-    # Sheets API クライアントを API キー付きで構築
-    service = build('sheets', 'v4', developerKey=api_key)
-    # スプレッドシートのメタデータ取得（全シートの title と index を取得）
-    try:
-        meta = service.spreadsheets().get(spreadsheetId=sheet_id, fields="sheets(properties(title,index))").execute()
-    except Exception as e:
-        raise RuntimeError(f"スプレッドシートのメタデータ取得に失敗: {e}")
+    import requests
+    # 複数回の呼び出しで TLS 接続を使い回すため Session を使う
+    with requests.Session() as session:
+        return _fetch_sheet_rows(session, api_key, sheet_id)
+
+def _select_sheet_title(meta, sheet_index):
+    """メタデータから対象シートの title を返す。sheet_index が None なら先頭シート。"""
     sheets = meta.get('sheets', [])
     if not sheets:
         raise RuntimeError("スプレッドシートにシートが存在しません")
+    if sheet_index is None:
+        # デフォルト: 先頭シート
+        return sheets[0]['properties']['title']
+    # sheets の中から index が一致するシートを探す
+    for s in sheets:
+        props = s.get('properties', {})
+        if props.get('index') == sheet_index:
+            return props.get('title')
+    raise RuntimeError(f"スプレッドシートに index={sheet_index} のシートが見つかりません")
 
+def _fetch_sheet_rows(session, api_key, sheet_id):
     # 環境変数で参照したいシートを指定可能にする
     # 優先度: SHEET_NAME が最優先、次に SHEET_INDEX（0-based）。未指定なら先頭シートを使用
     sheet_name_env = os.environ.get('SHEET_NAME')
     sheet_index_env = os.environ.get('SHEET_INDEX')
+    # SHEET_RANGE で取得する列を絞れる（例: 'A:G'）。レスポンスが小さくなり転送と JSON 解析が速くなる。
+    # 'シート1!A:G' のようにシート名を含めた場合はそのシートの範囲をそのまま使う
+    sheet_range_env = (os.environ.get('SHEET_RANGE') or '').strip()
+
+    def sheet_range(title):
+        """シート title（None なら先頭の表示シート）に SHEET_RANGE の列指定を付けた A1 範囲を返す。"""
+        if title is None:
+            return sheet_range_env or FIRST_SHEET_RANGE
+        if not sheet_range_env:
+            return title
+        return "'" + title.replace("'", "''") + "'!" + sheet_range_env
 
-    sheet_name = None
-    if sheet_name_env:
-        # 指定されたシート名をそのまま使用（存在確認は後続の API 呼び出しで失敗するためこの時点では軽く trim）
-        sheet_name = sheet_name_env.strip()
-    elif sheet_index_env:
-        try:
-            idx = int(sheet_index_env)
-        except ValueError:
-            raise RuntimeError(f"環境変数 SHEET_INDEX が整数ではありません: {sheet_index_env}")
-        # sheets の中から index が一致するシートを探す
-        matched = None
-        for s in sheets:
-            props = s.get('properties', {})
-            if props.get('index') == idx:
-                matched = props
-                break
-        if matched is None:
-            raise RuntimeError(f"スプレッドシートに index={idx} のシートが見つかりません")
-        sheet_name = matched.get('title')
-    else:
-        # デフォルト: 先頭シート
-        first = sheets[0]['properties']
-        sheet_name = first['title']
     # シート全体の値と書式を取得（header も含む）。取り消し線等の書式を調べるには
     # includeGridData=True を使って gridData を取得する必要がある。
-    try:
-        grid = service.spreadsheets().get(
-            spreadsheetId=sheet_id,
-            ranges=[sheet_name],
-            includeGridData=True
-        ).execute()
-    except Exception as e:
-        raise RuntimeError(f"スプレッドシートのデータ取得に失敗: {e}")
+    # fields で使う項目（シート名・セルの表示値・取り消し線）だけに絞り、書式全体は受け取らない。
+    def fetch_grid(range_):
+        return _sheets_get(session, api_key, sheet_id, ranges=[range_], includeGridData='true', fields=GRID_FIELDS)
+
+    def fetch_meta():
+        # grid の取得と並行して呼ぶので、requests.Session を共有せず専用の Session を使う
+        import requests
+        with requests.Session() as meta_session:
+            return _sheets_get(meta_session, api_key, sheet_id, fields="sheets(properties(title,index))")
+
+    if '!' in sheet_range_env or sheet_name_env:
+        # 範囲またはシート名が指定されていればメタデータ取得は省略し、1 回の呼び出しで済ませる
+        # 指定されたシート名をそのまま使用（存在確認は API 呼び出しで失敗するためこの時点では軽く trim）
+        if '!' in sheet_range_env:
+            data_range = sheet_range_env
+        else:
+            data_range = sheet_range(sheet_name_env.strip())
+        try:
+            grid = fetch_grid(data_range)
+        except Exception as e:
+            raise RuntimeError(f"スプレッドシートのデータ取得に失敗: {e}")
+    else:
+        sheet_index = None
+        if sheet_index_env:
+            try:
+                sheet_index = int(sheet_index_env)
+            except ValueError:
+                raise RuntimeError(f"環境変数 SHEET_INDEX が整数ではありません: {sheet_index_env}")
 
-    records = []
+        # シート名が未指定の場合は、メタデータ取得と「たぶんこのシート」というデータ取得を並行して行う。
+        # 推測先は前回解決したシート名、無ければ先頭シート（シート名なしの範囲は先頭の表示シートを指す）。
+        # 推測が外れていた場合だけ、メタデータから解決したシート名で取り直す。
+        # 前回のシート名がキャッシュにあってもメタデータは取得する: タブの並べ替えや名前変更で
+        # SHEET_INDEX（または先頭シート）が別のシートを指すようになっていないかを毎回確認するため。
+        # grid の取得と並行なので、待ち時間はほとんど増えない。
+        title_cache = None
+        if _get_cache_ttl() > 0:
+            title_cache = _cache_path(sheet_id, f"title-index={sheet_index or 0}")
+        guess = _read_cache(title_cache, float('inf')) if title_cache else None
+        speculate = guess is not None or not sheet_index
+
+        with concurrent.futures.ThreadPoolExecutor(max_workers=2) as executor:
+            meta_future = executor.submit(fetch_meta)
+            grid_future = executor.submit(fetch_grid, sheet_range(guess)) if speculate else None
+            try:
+                meta = meta_future.result()
+            except Exception as e:
+                raise RuntimeError(f"スプレッドシートのメタデータ取得に失敗: {e}")
+            sheet_name = _select_sheet_title(meta, sheet_index)
+            data_range = sheet_range(sheet_name)
+            grid = None
+            if grid_future is not None:
+                try:
+                    grid = grid_future.result()
+                    got = grid.get('sheets', [{}])[0].get('properties', {}).get('title')
+                except Exception:
+                    got = None
+                if got != sheet_name:
+                    grid = None
+        if grid is None:
+            try:
+                grid = fetch_grid(data_range)
+            except Exception as e:
+                raise RuntimeError(f"スプレッドシートのデータ取得に失敗: {e}")
+        if title_cache and guess != sheet_name:
+            _write_cache(title_cache, sheet_name)
+
+    rows = []
     try:
         sheets = grid.get('sheets', [])
         if not sheets:
-            return []
+            return {}, []
         data = sheets[0].get('data', [])[0]
-        rows = data.get('rowData', [])
-        if not rows:
-            return []
+        row_data = data.get('rowData', [])
+        if not row_data:
+            return {}, []
 
         # ヘッダー行 (formattedValue を優先)
-        header_cells = rows[0].get('values', [])
+        header_cells = row_data[0].get('values', [])
         headers = [c.get('formattedValue') or '' for c in header_cells]
+        field_idx = resolve_field_indexes(headers)
+        date_idxs = field_idx.get('date', [])
 
-        for row in rows[1:]:
-            rec = {}
-            meta_str = {}
+        for row in row_data[1:]:
             cells = row.get('values', [])
-            for i, h in enumerate(headers):
-                cell = cells[i] if i < len(cells) else {}
-                # セルの表示テキスト
-                val = cell.get('formattedValue') or ''
-                rec[h] = val
-
-                # 取り消し線判定: effectiveFormat.textFormat.strikethrough または
-                # textFormatRuns のいずれかの run に strikethrough があるかを確認
-                struck = False
-                eff = cell.get('effectiveFormat', {})
-                txtfmt = eff.get('textFormat', {}) if eff else {}
-                if txtfmt.get('strikethrough'):
-                    struck = True
-                else:
-                    runs = cell.get('textFormatRuns', [])
-                    for run in runs:
-                        fmt = run.get('format', {}).get('textFormat', {})
-                        if fmt.get('strikethrough'):
-                            struck = True
-                            break
-                meta_str[h] = struck
-
-            # 保存時にメタ情報を付与
-            rec['_meta_strikethrough'] = meta_str
-            records.append(rec)
+            # 日付列のいずれかのセルに取り消し線が付いている行はここで除外する
+            struck_cell = next((cells[i] for i in date_idxs if i < len(cells) and _is_struck(cells[i])), None)
+            if struck_cell is not None:
+                if os.environ.get('DEBUG'):
+                    print(f"[DEBUG] skipping row because date cell has strikethrough: {struck_cell.get('formattedValue')}")
+                continue
+            # セルの表示テキストだけをリストで保持する（列の対応は field_idx で引く）
+            rows.append([c.get('formattedValue') or '' for c in cells])
     except Exception:
         # フォールバック: 何か予期せぬ形式だった場合は values API を使う既存ロジックに戻す
         try:
-            result = service.spreadsheets().values().get(
-                spreadsheetId=sheet_id,
-                range=sheet_name
-            ).execute()
+            result = _sheets_get(session, api_key, f"{sheet_id}/values/{urllib.parse.quote(data_range, safe='')}")
             values = result.get('values', [])
             if not values:
-                return []
+                return {}, []
             headers = values[0]
-            for row in values[1:]:
-                rec = {}
-                for i, h in enumerate(headers):
-                    rec[h] = row[i] if i < len(row) else ''
-                rec['_meta_strikethrough'] = {h: False for h in headers}
-                records.append(rec)
+            field_idx = resolve_field_indexes(headers)
+            rows = values[1:]
         except Exception as e:
             raise RuntimeError(f"スプレッドシートのデータ取得に失敗: {e}")
     # デバッグ出力: ヘッダと最初の数行
     if os.environ.get('DEBUG'):
-        print(f"[DEBUG] Loaded {len(records)} records. Headers: {headers}")
-        for i, r in enumerate(records[:10]):
-            print(f"[DEBUG] record[{i}]: {r}")
-    return records
+        print(f"[DEBUG] Loaded {len(rows)} rows. Headers: {headers}, field_idx: {field_idx}")
+        for i, r in enumerate(rows[:10]):
+            print(f"[DEBUG] row[{i}]: {r}")
+    return field_idx, rows
 
-def parse_date_str(date_str, reference_year):
+# MM/DD（または MM-DD、末尾に年が付くもの）形式の日付
+_DATE_RE = re.compile(r'^\s*(\d{1,2})[/-](\d{1,2})(?:[/-]\d{2,4})?')
+# 時間セル（例: 13:00-14:30）の開始時刻
+_TIME_RE = re.compile(r'(\d{1,2}):(\d{2})')
+# 開始時刻が無い予定の並び順（その日の最後に並べる）
+_NO_TIME_SORT_KEY = 10**9
+# 年付きの日付として strptime で試す形式
+_DATE_FORMATS = ('%Y-%m-%d', '%Y/%m/%d')
+
+@functools.lru_cache(maxsize=4096)
+def parse_date_str(date_str, reference_year, allow_fuzzy=False):
+    """
+    日付セルの文字列を datetime.date にする。解釈できなければ None。
+    allow_fuzzy が真なら、既知の形式に当てはまらない文字列を dateutil で解析する（遅い）。
+    結果はキャッシュされるので、環境変数などに依存させず引数だけで決まるようにしておく。
+    """
     if not date_str or not isinstance(date_str, str):
         return None
     # MM/DD 形式の場合は正規表現で明示的に処理すると安全:
-    import re
-    m = re.match(r'^\s*(\d{1,2})[/-](\d{1,2})(?:[/-]\d{2,4})?', date_str)
+    m = _DATE_RE.match(date_str)
     if m:
+        # MM/DD 形式に一致した場合は dateparser には回さない（13/40 のような存在しない日付は None）
         # もし年が文字列に含まれていない可能性を厳密に扱いたい場合は
-        # さらに年付き形式との区別ロジックを追加可能。ただここでは dateparser も利用。
+        # さらに年付き形式との区別ロジックを追加可能。
         try:
             month = int(m.group(1))
             day = int(m.group(2))
             return datetime.date(reference_year, month, day)
-        except Exception:
+        except ValueError:
+            return None
+    for fmt in _DATE_FORMATS:
+        try:
+            return datetime.datetime.strptime(date_str.strip(), fmt).date()
+        except ValueError:
             pass
-    # fallback: dateutil.parser.parse
+    # fallback: dateutil.parser.parse（遅いので allow_fuzzy の場合のみ）
+    if not allow_fuzzy:
+        return None
+    from dateutil import parser as dateparser
     try:
         dt = dateparser.parse(date_str, default=datetime.datetime(reference_year, 1, 1))
         return dt.date()
     except (ValueError, OverflowError):
         return None
 
+# 今週の予定 1 件分
+Event = collections.namedtuple('Event', ('date', 'time', 'content', 'person', 'ev_type', 'absent_display', 'sort_key'))
+
 def find_week_events(records, week_dates):
+    """records（SheetRow の iterable）を 1 件ずつ読み、今週の予定だけを返す。"""
     events = []
     monday = min(week_dates)
     reference_year = monday.year
     debug = bool(os.environ.get('DEBUG'))
+    # 環境変数 ALLOW_FUZZY_DATES が設定されていれば、未知の形式の日付も dateutil で解析する
+    allow_fuzzy = bool(os.environ.get('ALLOW_FUZZY_DATES'))
+
+    # 今週の日付として受け付ける表記を先に列挙しておき、大半の行（今週以外）は
+    # 文字列の辞書引きだけで判定して日付オブジェクトを作らずに捨てる
+    week_by_raw = {}
+    week_by_md = {}
+    for wd in week_dates:
+        for raw in (f"{wd.month}/{wd.day}", f"{wd.month:02d}/{wd.day:02d}",
+                    f"{wd.month}-{wd.day}", f"{wd.month:02d}-{wd.day:02d}", wd.isoformat()):
+            week_by_raw[raw] = wd
+        week_by_md[(wd.month, wd.day)] = wd
+
     for row in records:
-        # 日付セルに取り消し線が付いている場合はスキップする
-        # 日付キー候補をチェックして、対応する '_meta_strikethrough' が True なら無視
-        meta = row.get('_meta_strikethrough', {})
-        date_keys = ['日付', 'date', 'Date']
-        skipped_by_strike = False
-        for dk in date_keys:
-            if dk in row and meta.get(dk):
-                if debug:
-                    print(f"[DEBUG] skipping row because date cell has strikethrough (key={dk}): {row}")
-                skipped_by_strike = True
-                break
-        if skipped_by_strike:
-            continue
         if debug:
             print(f"[DEBUG] row raw: {row}")
-        date_str = row.get('日付') or row.get('date') or row.get('Date') or ''
-        time_str = row.get('テスト時間') or row.get('time') or row.get('Time') or ''
-        # 予定のタイプ（優先: 予定タイプ > タイプ > 種別 > type）
-        type_str = (row.get('予定タイプ') or row.get('タイプ') or row.get('種別') or row.get('type') or row.get('Type') or '').strip()
-        content = row.get('内容') or row.get('content') or ''
-        person = row.get('担当') or row.get('person') or ''
-
-        # 欠席者列（優先: 欠席予定 > 欠席者 > 欠席 > absent）
-        absent_raw = (row.get('欠席予定') or row.get('欠席者') or row.get('欠席') or row.get('absent') or row.get('Absentees') or '')
-        absent_raw = str(absent_raw).strip()
-
+        date_str = str(row.date).strip()
         if not date_str:
             if debug:
                 print(f"[DEBUG] skipping row because date_str is empty: {row}")
             continue
-        d = parse_date_str(str(date_str).strip(), reference_year)
+        d = week_by_raw.get(date_str)
         if d is None:
-            if debug:
-                print(f"[DEBUG] could not parse date from '{date_str}' (ref year {reference_year})")
-            continue
+            m = _DATE_RE.match(date_str)
+            if m:
+                # MM/DD 形式なら月日だけで今週かどうかを判定できる
+                d = week_by_md.get((int(m.group(1)), int(m.group(2))))
+                if d is None:
+                    continue
+            else:
+                d = parse_date_str(date_str, reference_year, allow_fuzzy)
+                if d is None:
+                    if debug:
+                        print(f"[DEBUG] could not parse date from '{date_str}' (ref year {reference_year})")
+                    continue
+
+        time_str = row.time
+        type_str = row.type.strip()
+        content = row.content
+        person = row.person
+        absent_raw = str(row.absent).strip()
 
         if d in week_dates:
             if debug:
@@ -232,20 +472,22 @@ def find_week_events(records, week_dates):
             # 欠席者表示: 要求により、'欠席予定' の文字列をそのまま出力します（分割しない）
             absent_display = absent_raw if absent_raw else None
 
-            ev = {
-                'date': d,
-                'time': time_str if time_str else None,
-                'content': content,
-                'person': person,
-                'row': row,
-                'type': ev_type,
-                'type_raw': type_str,
-                'absent_raw': absent_raw,
-                'absent_display': absent_display,
-            }
-
-            if ev['type'] == 'ゼミ':
-                if ev['time']:
+            # 並び替え用に開始時刻を分単位の整数にしておく（"9:00" が "13:00" より前になるように）
+            tm = _TIME_RE.search(time_str)
+            sort_key = int(tm.group(1)) * 60 + int(tm.group(2)) if tm else _NO_TIME_SORT_KEY
+
+            ev = Event(
+                date=d,
+                time=time_str if time_str else None,
+                content=content,
+                person=person,
+                ev_type=ev_type,
+                absent_display=absent_display,
+                sort_key=sort_key,
+            )
+
+            if ev.ev_type == 'ゼミ':
+                if ev.time:
                     events.append(ev)
                     if debug:
                         print(f"[DEBUG] Added event (ゼミ): {events[-1]}")
@@ -259,49 +501,78 @@ def find_week_events(records, week_dates):
                     print(f"[DEBUG] Added event (重要日程): {events[-1]}")
     return events
 
+# date.weekday() → 曜日表記
+_WEEKDAY_JP = ('月', '火', '水', '木', '金', '土', '日')
+# ゼミの通常時間（これと異なる場合に注意を出す）
+_NORMAL_TIME = '13:00-14:30'
+# ゼミ予定の箇条書きの各行
+_BUL_PERSON = "> • 担当: "
+_BUL_TIME = "> • 時間: "
+_BUL_ABSENT = "> • 欠席予定: "
+_BUL_ABSENT_NONE = "> • 欠席予定: なし"
+_BUL_WARN = f"> • *※注意! 時間が通常の {_NORMAL_TIME} 以外です*"
+
 def format_schedule(events, monday_date, week_dates):
-    weekday_map = {0:'月',1:'火',2:'水',3:'木',4:'金',5:'土',6:'日'}
     start = monday_date
     end = monday_date + datetime.timedelta(days=6)
     # 表示を日本語月日表記にする例
     header = f"今週の予定：{start.month}月{start.day}日 〜 {end.month}月{end.day}日"
     if not events:
         return f"{header}\n予定はありません。"
-    events_sorted = sorted(events, key=lambda ev: (ev['date'], ev.get('time') or ''))
+    events_sorted = sorted(events, key=operator.attrgetter('date', 'sort_key'))
     lines = [header]
+    append = lines.append
     for ev in events_sorted:
-        d = ev['date']
+        d = ev.date
         md = f"{d.month}/{d.day}"
-        wd = weekday_map[d.weekday()]
+        wd = _WEEKDAY_JP[d.weekday()]
         # タイプ別の表示
-        if ev.get('type') == 'ゼミ':
+        if ev.ev_type == 'ゼミ':
             # デフォルト（ゼミ）: 1行目にメイン情報（タイトル）、
             # その下に箇条書きで担当・時間・欠席予定・注意を表示
-            header_line = f"{md}({wd}): {ev['content']}"
-            lines.append(header_line)
+            append(f"{md}({wd}): {ev.content}")
 
             # 箇条書きで各フィールドを表示
-            if ev.get('person'):
-                lines.append(f"> • 担当: {ev['person']}")
-            if ev.get('time'):
-                lines.append(f"> • 時間: {ev['time']}")
+            if ev.person:
+                append(_BUL_PERSON + ev.person)
+            if ev.time:
+                append(_BUL_TIME + ev.time)
 
             # 欠席予定はそのまま表示するが、箇条書きとして出す
             # 欠席がいない場合は 'なし' と表示する
-            if ev.get('absent_display'):
-                lines.append(f"> • 欠席予定: {ev['absent_display']}")
+            if ev.absent_display:
+                append(_BUL_ABSENT + ev.absent_display)
             else:
-                lines.append("> • 欠席予定: なし")
+                append(_BUL_ABSENT_NONE)
 
             # 注意表示は時間が存在し、かつ通常時間と異なる場合に箇条書きで出す
-            if ev.get('time') and ev.get('time') != '13:00-14:30':
-                lines.append("> • *※注意! 時間が通常の 13:00-14:30 以外です*")
+            if ev.time and ev.time != _NORMAL_TIME:
+                append(_BUL_WARN)
         else:
             # 重要日程は時間や注意の出力を行わず、内容のみを出力
-            line = f"{md}({wd}): {ev['content']}"
-            lines.append(line)
+            append(f"{md}({wd}): {ev.content}")
     return "\n".join(lines)
 
+SLACK_TIMEOUT_SECONDS = 5
+SLACK_MAX_ATTEMPTS = 3
+
+_slack = None
+
+def _get_slack(token):
+    """
+    プロセス内で 1 つだけ作った WebClient を返す（投稿ごとにクライアントとリトライ設定を作り直さない）。
+    slack_sdk は urllib でリクエストごとに接続するので、TCP/TLS 接続は使い回されない。
+    レート制限 (HTTP 429) は slack_sdk の RateLimitErrorRetryHandler が Retry-After 秒待って再試行する。
+    接続エラー時の再試行（デフォルトの ConnectionErrorRetryHandler）はそのまま残す。
+    """
+    global _slack
+    if _slack is None:
+        from slack_sdk import WebClient
+        from slack_sdk.http_retry.builtin_handlers import RateLimitErrorRetryHandler
+        _slack = WebClient(token=token, timeout=SLACK_TIMEOUT_SECONDS)
+        _slack.retry_handlers.append(RateLimitErrorRetryHandler(max_retry_count=SLACK_MAX_ATTEMPTS - 1))
+    return _slack
+
 def post_to_slack(text):
     token = os.environ.get('SLACK_BOT_TOKEN')
     channel = os.environ.get('SLACK_CHANNEL')
@@ -310,7 +581,8 @@ def post_to_slack(text):
         print("Slack 設定がされていないため、出力結果:")
         print(text)
         return
-    client = WebClient(token=token)
+    from slack_sdk.errors import SlackApiError
+    client = _get_slack(token)
     try:
         client.chat_postMessage(channel=channel, text=text)
         print("Slack へ投稿しました。")
@@ -318,8 +590,15 @@ def post_to_slack(text):
         print(f"Slack への投稿に失敗: {e.response['error']}")
         print("出力結果:")
         print(text)
+    except OSError as e:
+        # タイムアウト (TimeoutError) や接続エラー (URLError) も投稿失敗として扱い、結果を出力する
+        print(f"Slack への投稿に失敗: {e}")
+        print("出力結果:")
+        print(text)
 
 def main():
+    from dotenv import load_dotenv
+    load_dotenv()
     today = get_today_jst()
     monday = get_monday_date(today)
     week_dates = build_week_dates(monday)
@@ -329,7 +608,7 @@ def main():
 
     # 公開シート用読み込み
     try:
-        records = load_public_sheet_records()
+        records = iter_public_sheet_records()
     except Exception as e:
         print(f"スプレッドシートの読み込みに失敗: {e}")
         return
@@ -337,6 +616,10 @@ def main():
     events = find_week_events(records, week_dates)
     text = format_schedule(events, monday, week_dates)
     print(text)  # デバッグ用にコンソール出力
+    # 環境変数 SKIP_EMPTY が設定されていれば、予定の無い週は Slack に投稿しない
+    if not events and os.environ.get('SKIP_EMPTY'):
+        print("今週の予定が無いため Slack への投稿をスキップします。")
+        return
     post_to_slack(text)
 
 if __name__ == '__main__':